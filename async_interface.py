@@ -0,0 +1,261 @@
+"""
+asyncio front end for Interface with a dedicated GPIO thread
+
+One I/O thread owns the pins and runs scan operations one at a time in submission
+order. Host-side preparation (hex dump parsing, payload generation, diffing) is
+compiled in a separate worker process, so it runs on the other core while the
+current job is scanning instead of competing with the I/O thread for the GIL.
+At most `max_pending` operations are queued, further calls wait before enqueuing.
+
+If a scan fails part way, the scan pins are cleared and the scan chains reset
+before the next operation runs. If that recovery fails too, every later
+operation fails with the same error.
+
+The compile worker is started through a forkserver, which imports the calling
+script again, so scripts using this module need an `if __name__ == "__main__":` guard.
+
+Usage:
+    async with AsyncInterface(Interface()) as iface:
+        main_data, input_data = await iface.load(config)
+        await iface.config_clkgen(freq_sel=4, ro_sel=2)
+        await iface.run()
+        main_read, input_read, output_read = await iface.read(output_len=1600)
+"""
+
+import asyncio
+import multiprocessing
+import queue
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from host_utils import FULL_MASK, Config, Sram, compile_masked_writes, diff_to_masked_writes
+from utils import Interface, logger
+
+
+# compile functions run in the worker process, so they must be module level and
+# only take picklable arguments
+
+
+def _compile_load(main_sram: Sram, input_sram: Sram, config: Config, main_data, input_data):
+    if config is not None:
+        main_data = main_sram.hex_dump_to_data(config.c_hexdump)
+        if config.data_hexdump is not None:
+            input_data = input_sram.hex_dump_to_data(config.data_hexdump)
+    payloads = {}
+    for name, sram, data in (("main", main_sram, main_data), ("input", input_sram, input_data)):
+        if data is not None:
+            writes = [(addr, word, FULL_MASK) for addr, word in enumerate(data)]
+            sram.check_writes(writes)
+            payloads[name] = compile_masked_writes(writes)
+    return main_data, input_data, payloads
+
+
+def _compile_update(sram: Sram, old_data, new_data):
+    writes = diff_to_masked_writes(old_data, new_data)
+    sram.check_writes(writes)
+    return compile_masked_writes(writes)
+
+
+class AsyncInterface:
+    def __init__(self, interface: Interface, max_pending: int = 2):
+        """
+        interface: the Interface whose pins are handed over to the I/O thread,
+            do not use it directly while this object is open
+        max_pending: maximum number of operations queued for the I/O thread
+        """
+        self.interface = interface
+        self.max_pending = max_pending
+        self._queue = queue.Queue()
+        # the worker starts on first use, with the I/O thread running and the overlay
+        # mapped, so it must not be forked from this process
+        self._compile_pool = ProcessPoolExecutor(
+            max_workers=1, mp_context=multiprocessing.get_context("forkserver")
+        )
+        self._broken = None  # error of a failed recovery, fails every later operation
+        self._io_thread = threading.Thread(target=self._io_loop, name="gpio-io", daemon=True)
+        self._enqueue_lock = None
+        self._slots = None
+        self._closed = False
+        self._io_thread.start()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    # ========= I/O thread =========
+
+    def _io_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            compiled, execute, loop, future = item
+            try:
+                if self._broken is not None:
+                    raise self._broken
+                # compile errors are raised here, before any pin is touched
+                compiled = compiled.result()
+            except BaseException as e:
+                loop.call_soon_threadsafe(self._finish, future, None, e)
+                continue
+            try:
+                res = execute(compiled)
+            except BaseException as e:
+                logger.error(f"Scan operation failed, recovering scan chains: {e!r}")
+                self._recover()
+                loop.call_soon_threadsafe(self._finish, future, None, e)
+            else:
+                loop.call_soon_threadsafe(self._finish, future, res, None)
+
+    def _recover(self):
+        """
+        bring the scan interface back to idle after an operation failed part way
+        """
+        iface = self.interface
+        try:
+            for pin in (
+                iface.scanInValid,
+                iface.scanLoad,
+                iface.scanRead,
+                iface.chainSelEn,
+                iface.scanInPayload,
+            ):
+                pin.off()
+            # also leaves test mode
+            iface._scan_reset_regs()
+        except BaseException as e:
+            logger.critical(f"Scan chain recovery failed, failing all further operations: {e!r}")
+            self._broken = e
+
+    def _finish(self, future, res, exc):
+        self._slots.release()
+        if future.cancelled():
+            return
+        if exc is not None:
+            future.set_exception(exc)
+        else:
+            future.set_result(res)
+
+    async def _submit(self, compile_fn, compile_args, execute):
+        """
+        compile_fn(*compile_args) runs in the compile process (None to skip),
+        execute(compiled) then runs on the I/O thread
+        """
+        if self._closed:
+            raise RuntimeError("AsyncInterface is closed")
+        loop = asyncio.get_running_loop()
+        if self._enqueue_lock is None:
+            self._enqueue_lock = asyncio.Lock()
+            self._slots = asyncio.Semaphore(self.max_pending)
+
+        # the lock is FIFO, so operations reach the queue in call order
+        async with self._enqueue_lock:
+            await self._slots.acquire()
+            try:
+                if compile_fn is None:
+                    compiled = Future()
+                    compiled.set_result(None)
+                else:
+                    compiled = self._compile_pool.submit(compile_fn, *compile_args)
+                future = loop.create_future()
+                self._queue.put((compiled, execute, loop, future))
+            except BaseException:
+                # _finish releases the slot only for queued operations
+                self._slots.release()
+                raise
+        return await future
+
+    # ========= operations =========
+
+    def _execute_load(self, compiled):
+        main_data, input_data, payloads = compiled
+        iface = self.interface
+        iface._prepare_scan_in()
+        for sram, payload_strs in payloads.items():
+            logger.info(f"Loading in {sram} SRAM data")
+            iface._scan_payloads_to_sram(getattr(iface, f"{sram}_sram"), payload_strs)
+        return main_data, input_data
+
+    async def load(self, config: Config = None, main_data: list = None, input_data: list = None):
+        """
+        load srams from a Config or from data lists, None leaves an sram untouched
+
+        return (main_data, input_data) as loaded
+        """
+        if config is not None and (main_data is not None or input_data is not None):
+            raise ValueError("Load either from a Config or from data lists, not both")
+        iface = self.interface
+        return await self._submit(
+            _compile_load,
+            (iface.main_sram, iface.input_sram, config, main_data, input_data),
+            self._execute_load,
+        )
+
+    async def update(self, sram_name: str, old_data: list, new_data: list):
+        """
+        write only the bytes that differ between old_data and new_data, see Interface.update_sram
+
+        return number of words written
+        """
+        iface = self.interface
+        sram = getattr(iface, f"{sram_name}_sram")
+
+        def execute(payload_strs):
+            if payload_strs:
+                iface._prepare_scan_in()
+                iface._scan_payloads_to_sram(sram, payload_strs)
+            return len(payload_strs)
+
+        return await self._submit(_compile_update, (sram, old_data, new_data), execute)
+
+    async def config_clkgen(self, freq_sel, ro_sel):
+        return await self._submit(
+            None, (), lambda _: self.interface.config_clkgen(freq_sel, ro_sel)
+        )
+
+    async def run(self, timeout=60):
+        """
+        run the program, return False on timeout, see Interface.run_program
+        """
+        return await self._submit(
+            None, (), lambda _: self.interface.run_program(timeout=timeout)
+        )
+
+    async def read(
+        self,
+        main_len: int = None,
+        input_len: int = None,
+        output_len: int = None,
+        verifiers: dict = None,
+    ):
+        """
+        read out srams, see Interface.load_out_data
+
+        return (main_read_data, input_read_data, output_read_data)
+        """
+        return await self._submit(
+            None,
+            (),
+            lambda _: self.interface.load_out_data(
+                main_len, input_len, output_len, verifiers=verifiers
+            ),
+        )
+
+    async def close(self):
+        """
+        finish all queued operations and stop the I/O thread
+        """
+        if self._closed:
+            return
+        self._closed = True
+        if self._enqueue_lock is not None:
+            # wait for operations still waiting to be enqueued
+            async with self._enqueue_lock:
+                self._queue.put(None)
+        else:
+            self._queue.put(None)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._io_thread.join)
+        self._compile_pool.shutdown()
@@ -0,0 +1,266 @@
+"""
+Host-side benchmarks for the scan stack, run against the simulated GPIO backend (sim.py)
+
+Reports words/s and GPIO ops/word for each stage, and compares against a stored baseline
+
+Usage:
+    python benchmark.py                     # run and compare with the baseline if present
+    python benchmark.py --save-baseline     # store the results as the new baseline
+    python benchmark.py --threshold 0.2     # fail if words/s drops more than 20% below the baseline
+"""
+
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+
+from utils import Config, Interface, FULL_MASK_STR, logger
+from sim import SimChip
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+FIRMWARE_DUMP = os.path.join(ROOT_DIR, "dma_test", "dma_test.v")
+DATA_DUMP = os.path.join(ROOT_DIR, "dma_test", "data_dump.v")
+IMAGE_DUMP = os.path.join(ROOT_DIR, "hcd_loop_test", "test_input", "image_dump.v")
+DEFAULT_BASELINE = os.path.join(ROOT_DIR, "benchmark_baseline.json")
+DEFAULT_THRESHOLD = 0.1
+# modules whose cold import time is reported, relative to a bare interpreter start
+COLD_START_MODULES = ("host_utils", "utils", "sim", "verify", "runner")
+
+
+def sim_interface(**chip_kwargs):
+    """
+    Create an Interface wired to a fresh simulated chip
+    """
+    chip = SimChip(**chip_kwargs)
+    interface = Interface(clkgen=chip.clkgen, iopad=chip.iopad)
+    return chip, interface
+
+
+def _best_of(func, repeat):
+    """
+    run func `repeat` times and return (best time in seconds, last return value)
+    """
+    best = None
+    res = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        res = func()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, res
+
+
+def _result(name, words, seconds, ops=None):
+    return {
+        "name": name,
+        "words": words,
+        "seconds": seconds,
+        "words_per_s": words / seconds if seconds > 0 else float("inf"),
+        "ops_per_word": ops / words if ops is not None and words else None,
+    }
+
+
+def bench_read_hex_dump(path, repeat):
+    seconds, hexdump = _best_of(lambda: Config.read_hex_dump(path), repeat)
+    return _result(f"read_hex_dump[{os.path.basename(path)}]", len(hexdump) // 4, seconds)
+
+
+def bench_hex_dump_to_data(path, repeat):
+    _, interface = sim_interface()
+    hexdump = Config.read_hex_dump(path)
+    seconds, data = _best_of(
+        lambda: interface.input_sram.hex_dump_to_data(hexdump), repeat
+    )
+    return _result(f"hex_dump_to_data[{os.path.basename(path)}]", len(data), seconds)
+
+
+def bench_gen_scan_payload_str(data, repeat):
+    def gen():
+        for addr, word in enumerate(data):
+            Interface._gen_scan_payload_str(
+                addr=addr, data=word, enable=True, write=True, mask=FULL_MASK_STR
+            )
+
+    seconds, _ = _best_of(gen, repeat)
+    return _result("gen_scan_payload_str", len(data), seconds)
+
+
+def bench_scan_to_sram(data, repeat):
+    chip, interface = sim_interface()
+
+    def scan():
+        chip.reset_ops()
+        interface._scan_to_sram(interface.input_sram, data)
+        return chip.ops
+
+    seconds, ops = _best_of(scan, repeat)
+    return _result("scan_to_sram", len(data), seconds, ops)
+
+
+def bench_scan_from_sram(data, repeat):
+    chip, interface = sim_interface()
+    chip.srams["input"][: len(data)] = data
+
+    def scan():
+        chip.reset_ops()
+        interface._scan_from_sram(interface.input_sram, len(data))
+        return chip.ops
+
+    seconds, ops = _best_of(scan, repeat)
+    return _result("scan_from_sram", len(data), seconds, ops)
+
+
+def bench_update_sram(data, repeat, changed_every=100):
+    """
+    masked update of a frame where one in `changed_every` words differs from the loaded one
+    """
+    chip, interface = sim_interface()
+    new_data = [
+        word ^ 0xFF if addr % changed_every == 0 else word
+        for addr, word in enumerate(data)
+    ]
+
+    def update():
+        chip.srams["input"][: len(data)] = data
+        chip.reset_ops()
+        interface.update_sram(interface.input_sram, data, new_data)
+        return chip.ops
+
+    seconds, ops = _best_of(update, repeat)
+    return _result(f"update_sram[1/{changed_every} changed]", len(data), seconds, ops)
+
+
+def bench_full_cycle(config, repeat):
+    """
+    load_in_data -> run_program -> load_out_data, reading back everything that was loaded
+    """
+    chip, interface = sim_interface()
+
+    def cycle():
+        chip.reset_ops()
+        main_data, input_data = interface.load_in_data(config)
+        interface.run_program()
+        interface.load_out_data(len(main_data), len(input_data), len(input_data))
+        # main and input scanned in and out, output scanned out
+        words = 2 * len(main_data) + 3 * len(input_data)
+        return words, chip.ops
+
+    seconds, (words, ops) = _best_of(cycle, repeat)
+    return _result("load_run_load_out", words, seconds, ops)
+
+
+def run_benchmarks(repeat=3):
+    results = []
+    for path in (DATA_DUMP, IMAGE_DUMP):
+        results.append(bench_read_hex_dump(path, repeat))
+        results.append(bench_hex_dump_to_data(path, repeat))
+
+    _, interface = sim_interface()
+    data = interface.input_sram.hex_dump_to_data(Config.read_hex_dump(IMAGE_DUMP))
+    results.append(bench_gen_scan_payload_str(data, repeat))
+    results.append(bench_scan_to_sram(data, repeat))
+    results.append(bench_scan_from_sram(data, repeat))
+    results.append(bench_update_sram(data, repeat))
+    results.append(bench_full_cycle(Config(FIRMWARE_DUMP, DATA_DUMP), repeat))
+    return results
+
+
+def bench_cold_start(repeat):
+    """
+    time a fresh interpreter importing each module, minus a bare interpreter start
+    """
+
+    def start(code):
+        return _best_of(
+            lambda: subprocess.run(
+                [sys.executable, "-c", code],
+                cwd=ROOT_DIR,
+                check=True,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            ),
+            repeat,
+        )[0]
+
+    bare = start("pass")
+    results = []
+    for module in COLD_START_MODULES:
+        try:
+            seconds = start(f"import {module}") - bare
+        except subprocess.CalledProcessError:
+            seconds = None  # missing optional dependency
+        results.append({"name": f"import {module}", "seconds": seconds})
+    return results
+
+
+def compare_with_baseline(results, baseline, threshold):
+    """
+    Compare words/s with the baseline, return list of names that regressed more than threshold
+    """
+    baseline = {r["name"]: r for r in baseline}
+    regressions = []
+    for r in results:
+        base = baseline.get(r["name"])
+        if base is None:
+            r["ratio"] = None
+            continue
+        r["ratio"] = r["words_per_s"] / base["words_per_s"]
+        if r["ratio"] < 1 - threshold:
+            regressions.append(r["name"])
+    return regressions
+
+
+def print_report(results):
+    print(f"{'benchmark':<36} {'words':>8} {'words/s':>12} {'ops/word':>9} {'vs base':>8}")
+    for r in results:
+        ops = "-" if r["ops_per_word"] is None else f"{r['ops_per_word']:.1f}"
+        ratio = "-" if r.get("ratio") is None else f"{r['ratio']:.2f}x"
+        print(
+            f"{r['name']:<36} {r['words']:>8} {r['words_per_s']:>12.0f} {ops:>9} {ratio:>8}"
+        )
+
+
+def print_cold_start(results):
+    print(f"{'cold start':<36} {'ms':>8}")
+    for r in results:
+        ms = "n/a" if r["seconds"] is None else f"{r['seconds'] * 1000:.1f}"
+        print(f"{r['name']:<36} {ms:>8}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the scan stack on a simulated chip")
+    parser.add_argument("--repeat", "-r", type=int, default=3, help="repeats per benchmark, best time is kept")
+    parser.add_argument("--baseline", "-b", default=DEFAULT_BASELINE, help="baseline json file")
+    parser.add_argument("--save-baseline", action="store_true", help="save results as the new baseline")
+    parser.add_argument("--threshold", "-t", type=float, default=DEFAULT_THRESHOLD, help="allowed words/s drop vs baseline")
+    parser.add_argument("--no-cold-start", action="store_true", help="skip measuring module import times")
+    args = parser.parse_args()
+
+    # keep per-bit debug logging out of the measurement
+    logger.setLevel(logging.WARNING)
+
+    results = run_benchmarks(args.repeat)
+
+    regressions = []
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(results, baseline, args.threshold)
+
+    print_report(results)
+    if not args.no_cold_start:
+        print()
+        print_cold_start(bench_cold_start(args.repeat))
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+
+    if regressions:
+        print(f"\033[91mRegressed more than {args.threshold:.0%}: {', '.join(regressions)}\033[0m")
+        sys.exit(1)
@@ -1,7 +1,6 @@
 import os
 import numpy as np
 from PIL import Image
-import matplotlib.pyplot as plt
 
 
 def hcd_output_process(
@@ -20,6 +19,9 @@ def hcd_output_process(
         output_img_name: name of the output image file
     """
 
+    # only pay for matplotlib when actually plotting
+    import matplotlib.pyplot as plt
+
     image_width = 40
     image_height = 40
     image = Image.open(original_img_path)
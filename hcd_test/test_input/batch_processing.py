@@ -0,0 +1,132 @@
+"""
+batch preprocess images into one indexed frame archive
+
+Images are resized and quantized in a process pool, packed into input sram words
+(one pixel per word, same layout as image_processing.py's image_dump.v) and saved
+as a single npz archive that runners read frames from by index.
+
+Usage:
+    python batch_processing.py image_dir -o frames.npz
+    python batch_processing.py image_stack.npy -o frames.npz
+"""
+
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+from PIL import Image
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from host_utils import INPUT_ROW_COUNT, SRAM_WORD_WIDTH
+from image_processing import IMG_HEIGHT, IMG_WIDTH, load_image
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff")
+DEFAULT_ARCHIVE_FILE = "frames.npz"
+
+
+def quantize_frame(frame, scale=1):
+    """
+    turn one array frame (grayscale or RGB) into a IMG_HEIGHT x IMG_WIDTH grayscale uint8 array
+
+    scale: factor applied to non uint8 frames before rounding, e.g. 255 for floats in [0, 1]
+    """
+    frame = np.asarray(frame)
+    if frame.dtype != np.uint8:
+        frame = np.clip(np.rint(frame * scale), 0, 255).astype(np.uint8)
+    image = Image.fromarray(frame).convert("L")
+    if image.size != (IMG_WIDTH, IMG_HEIGHT):
+        image = image.resize((IMG_WIDTH, IMG_HEIGHT))
+    return np.array(image, dtype=np.uint8)
+
+
+def list_images(image_dir):
+    return sorted(
+        os.path.join(image_dir, f)
+        for f in os.listdir(image_dir)
+        if f.lower().endswith(IMAGE_EXTENSIONS)
+    )
+
+
+def preprocess(sources, workers=None, chunksize=32):
+    """
+    resize and quantize frames in a process pool
+
+    sources: list of image file paths or an array stack (N x H x W [x C]),
+        a float stack whose values all lie in [0, 1] is scaled to 0-255
+    return N x IMG_HEIGHT x IMG_WIDTH uint8 array
+    """
+    if isinstance(sources, list):
+        func = load_image
+    elif sources.shape[1:] == (IMG_HEIGHT, IMG_WIDTH) and sources.dtype == np.uint8:
+        # already in shape, nothing to do per frame
+        return np.asarray(sources)
+    else:
+        # decided once for the whole stack, a dark frame must not be scaled differently
+        is_unit = np.issubdtype(sources.dtype, np.floating) and sources.size and sources.max() <= 1
+        func = partial(quantize_frame, scale=255 if is_unit else 1)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        frames = list(pool.map(func, sources, chunksize=chunksize))
+    return np.stack(frames) if frames else np.zeros((0, IMG_HEIGHT, IMG_WIDTH), np.uint8)
+
+
+def pack_frames(frames):
+    """
+    pack N x IMG_HEIGHT x IMG_WIDTH uint8 frames into N x (IMG_HEIGHT * IMG_WIDTH) sram words
+    """
+    words_per_frame = IMG_HEIGHT * IMG_WIDTH
+    # same bound as Sram.hex_dump_to_data
+    if words_per_frame >= INPUT_ROW_COUNT:
+        raise ValueError(
+            f"Frame is too large for the input SRAM! Words per frame: {words_per_frame}, SRAM row count: {INPUT_ROW_COUNT}"
+        )
+    return frames.reshape(len(frames), words_per_frame).astype(f"<u{SRAM_WORD_WIDTH // 8}")
+
+
+def save_archive(archive_file, words, names):
+    np.savez(archive_file, words=words, names=np.asarray(names, dtype=str))
+    print(f"{len(words)} frames saved to {archive_file}")
+
+
+class FrameArchive:
+    """
+    frames from save_archive, archive[i] is the input sram data list of frame i
+    """
+
+    def __init__(self, archive_file):
+        with np.load(archive_file) as archive:
+            self.words = archive["words"]
+            self.names = archive["names"]
+
+    def __len__(self):
+        return len(self.words)
+
+    def __getitem__(self, index):
+        return self.words[index].tolist()
+
+    def index(self, name):
+        matches = np.flatnonzero(self.names == name)
+        if not matches.size:
+            raise KeyError(f"No frame named {name!r} in the archive")
+        return int(matches[0])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batch preprocess images into a frame archive")
+    parser.add_argument("source", help="image directory or .npy image stack")
+    parser.add_argument("--output", "-o", default=DEFAULT_ARCHIVE_FILE, help="archive file name")
+    parser.add_argument("--workers", "-j", type=int, default=None, help="number of worker processes")
+    args = parser.parse_args()
+
+    if os.path.isdir(args.source):
+        sources = list_images(args.source)
+        names = [os.path.basename(f) for f in sources]
+    else:
+        sources = np.load(args.source, mmap_mode="r")
+        names = [str(i) for i in range(len(sources))]
+
+    frames = preprocess(sources, workers=args.workers)
+    save_archive(args.output, pack_frames(frames), names)
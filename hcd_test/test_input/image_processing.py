@@ -18,16 +18,26 @@ INPUT_WIDTH = ROW_BUFFER_SIZE * PIXEL_WIDTH
 
 DEFUALT_IMAGE_FILE = "image.png"
 
-parser = argparse.ArgumentParser(description="Generate hex dump from image")
-parser.add_argument(
-    "--image_file", "-i", help="image file name to generate hex dump from"
-)
-args = parser.parse_args()
 
-IMAGE_FILE = args.image_file
+def load_image(image_file):
+    """
+    load an image as a IMG_HEIGHT x IMG_WIDTH grayscale uint8 array
+    """
+    image = Image.open(image_file)
+    image = image.convert("L")
+    image = image.resize((IMG_WIDTH, IMG_HEIGHT))
+    return np.array(image, dtype=np.uint8)
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate hex dump from image")
+    parser.add_argument(
+        "--image_file", "-i", help="image file name to generate hex dump from"
+    )
+    args = parser.parse_args()
+
+    IMAGE_FILE = args.image_file
+
     if not IMAGE_FILE:
         print("No image file specified, using generated data...")
 
@@ -45,10 +55,7 @@ if __name__ == "__main__":
         IMAGE_FILE = DEFUALT_IMAGE_FILE
     else:
         # parse image to numpy array
-        image = Image.open(IMAGE_FILE)
-        image = image.convert("L")
-        image = image.resize((IMG_WIDTH, IMG_HEIGHT))
-        img = np.array(image, dtype=np.uint8)
+        img = load_image(IMAGE_FILE)
         Image.fromarray(img).save(DEFUALT_IMAGE_FILE)
         print(f"Resized image saved to {DEFUALT_IMAGE_FILE}")
 
@@ -0,0 +1,239 @@
+"""
+Host-side sram data handling and scan payload codec
+
+Pure python with no board access and no logging setup, safe to import off-board.
+utils re-exports everything here.
+"""
+
+import logging
+import math
+
+# Constants
+SRAM_WORD_WIDTH = 32
+MAINROW_COUNT = 4096
+MAIN_COLMUX = 8
+INPUT_ROW_COUNT = 2048
+INPUT_COLMUX = 8
+OUTPUT_ROW_COUNT = 2048
+OUTPUT_COLMUX = 8
+SCANCHAIN_IDS = range(9)  # total ids in the scan chain
+SCAN_CTRL_BITS = 8  # number of bits in the scan control
+SCAN_ADDR_BITS = 16
+SCAN_DATA_BITS = 32
+BYTES_PER_WORD = SRAM_WORD_WIDTH // 8
+FULL_MASK = (1 << BYTES_PER_WORD) - 1  # write mask enabling every byte of a word
+SCAN_ID_MAP = {
+    "main": {"read": 0, "write": 1},
+    "input": {"read": 2, "write": 3},
+    "output": {"read": 4, "write": 5},
+}
+
+logger = logging.getLogger()
+
+
+class Config:
+    @staticmethod
+    def read_hex_dump(file_path):
+        """
+        Read hex dump file and return a list of hex values
+        """
+        hex_data = []
+        with open(file_path, "r") as f:
+            lines = f.readlines()
+            for line in lines:
+                if line.startswith("@"):
+                    continue
+                else:
+                    hex_data.extend(line.split())
+        return hex_data
+
+    def __init__(self, c_test_dump, data_dump=None):
+        logger.debug(
+            f"Initializing Config with c_test_dump: {c_test_dump}, data_dump: {data_dump}"
+        )
+        self.c_hexdump = self.read_hex_dump(c_test_dump)
+        if data_dump is not None:
+            self.data_hexdump = self.read_hex_dump(data_dump)
+        else:
+            self.data_hexdump = None
+
+
+class Sram:
+    def __init__(self, row_count, colmux, id_read, id_write, word_width=32):
+        logger.debug(
+            f"Initializing SRAM with row_count: {row_count}, colmux: {colmux}, id_read: {id_read}, id_write: {id_write}, word_width: {word_width}"
+        )
+        self.row_count = row_count
+        self.colmux = colmux
+        self.id_read = id_read
+        self.id_write = id_write
+        assert self.id_write == self.id_read + 1, "id_write should be id_read + 1"
+
+    def hex_dump_to_data(self, hexdump):
+        """
+        parse a list of hex values to a list of data values in accordance to the sram config
+
+        hexdump: list of 8bit hex values (e.g. ['08', 'a0', '10', 'ff'])
+        """
+        data_per_word = SRAM_WORD_WIDTH / 8
+        if not data_per_word.is_integer():
+            raise ValueError(
+                f"word_width must be a multiple of 8! Received word width: {SRAM_WORD_WIDTH}"
+            )
+        data_per_word = int(data_per_word)
+
+        row_needed = math.ceil(len(hexdump) / data_per_word)
+        if row_needed >= self.row_count:
+            raise ValueError(
+                f"Data length is too long for the SRAM! Data length: {row_needed}, SRAM row count: {self.row_count}"
+            )
+
+        result_lst = []
+        data = 0
+        for i in range(len(hexdump)):
+            data = data | int(hexdump[i], 16) << (8 * (i % data_per_word))
+            if (i + 1) % data_per_word == 0:
+                result_lst.append(data)
+                data = 0
+
+        # left over
+        if len(hexdump) % data_per_word != 0:
+            result_lst.append(data)
+
+        return result_lst
+
+    def check_writes(self, writes):
+        """
+        make sure every (address, data, mask) write targets a row of this sram and fits the
+        scan payload fields
+
+        an out of range value would change the payload length and silently corrupt the scan
+        """
+        for addr, data, mask in writes:
+            if not 0 <= addr < self.row_count:
+                raise ValueError(
+                    f"Address out of range for the SRAM! Address: {addr}, SRAM row count: {self.row_count}"
+                )
+            if not 0 <= data < 1 << SRAM_WORD_WIDTH:
+                raise ValueError(f"Data out of range for a {SRAM_WORD_WIDTH} bit word! Address: {addr}, data: {data}")
+            if not 0 <= mask <= FULL_MASK:
+                raise ValueError(f"Byte mask out of range! Address: {addr}, mask: {mask}")
+
+
+def gen_scan_payload_str(addr: int, data: int, enable: bool, write: bool, mask: str):
+    """
+    Generate scan chain scan in payload string
+
+    addr: address to write/read
+    data: data to write
+    enable: enable the SRAM
+    write: write (1) or read (0)
+    mask: read/write mask (4 bits for now)
+    """
+    # read/wrie address
+    addr = format(addr, f"0{SCAN_ADDR_BITS}b")
+    # write data, set to 0 if read
+    data = format(data, f"0{SCAN_DATA_BITS}b")
+    # enable the SRAM
+    enable = format(enable, "01b")
+    # write (1) or read (0)
+    write = format(write, "01b")
+    # read/write mask (4 bits for now)
+    mask = mask
+
+    # payload str
+    payload_str = addr + data + enable + write + mask
+
+    return payload_str
+
+
+def mask_to_str(mask: int):
+    """
+    format a byte mask for gen_scan_payload_str, bit i of mask enables byte i of the word
+
+    the bit to byte mapping follows the sim.py model and is not yet confirmed on the chip
+    """
+    return format(mask, f"0{BYTES_PER_WORD}b")
+
+
+FULL_MASK_STR = mask_to_str(FULL_MASK)
+
+
+def bytes_to_masked_writes(byte_updates: dict):
+    """
+    group byte updates into masked word writes
+
+    byte_updates: {byte address: 8bit value}
+    return list of (word address, data, mask) sorted by word address
+    """
+    words = {}
+    for byte_addr, value in byte_updates.items():
+        if not 0 <= value <= 0xFF:
+            raise ValueError(f"Byte value out of range! Byte address: {byte_addr}, value: {value}")
+        addr, byte = divmod(byte_addr, BYTES_PER_WORD)
+        data, mask = words.get(addr, (0, 0))
+        words[addr] = (data | value << (8 * byte), mask | 1 << byte)
+    return [(addr, data, mask) for addr, (data, mask) in sorted(words.items())]
+
+
+def compile_masked_writes(writes: list):
+    """
+    generate the scan in payload strings of masked writes
+
+    writes: list of (word address, data, mask), not validated here, run Sram.check_writes first
+    """
+    return [
+        gen_scan_payload_str(
+            addr=addr, data=data, enable=True, write=True, mask=mask_to_str(mask)
+        )
+        for addr, data, mask in writes
+    ]
+
+
+def diff_to_masked_writes(old_data: list, new_data: list):
+    """
+    masked word writes that turn old_data into new_data, touching only the bytes that changed
+
+    old_data: data list currently in the sram (may be shorter than new_data)
+    new_data: data list that should end up in the sram
+    return list of (word address, data, mask)
+    """
+    writes = []
+    for addr, new in enumerate(new_data):
+        if addr >= len(old_data):
+            writes.append((addr, new, FULL_MASK))
+            continue
+        diff = old_data[addr] ^ new
+        if diff == 0:
+            continue
+        mask = 0
+        for byte in range(BYTES_PER_WORD):
+            if diff >> (8 * byte) & 0xFF:
+                mask |= 1 << byte
+        writes.append((addr, new, mask))
+    return writes
+
+
+def is_same_data(original_data, load_out_data):
+    """
+    Verify the data loaded out from the SRAM with the original data
+    """
+    if original_data == load_out_data:
+        logger.debug("Data match!")
+        return True
+    else:
+        if len(original_data) != len(load_out_data):
+            logger.error(
+                f"Data mismatch! Length differs, original: {len(original_data)}, load out: {len(load_out_data)}"
+            )
+        else:
+            mismatch_addrs = [
+                addr
+                for addr, (a, b) in enumerate(zip(original_data, load_out_data))
+                if a != b
+            ]
+            logger.error(
+                f"Data mismatch! {len(mismatch_addrs)} words differ, first at address {mismatch_addrs[0]:#x}"
+                " (use verify.Verifier for bit level diagnostics)"
+            )
+        return False
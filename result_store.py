@@ -0,0 +1,236 @@
+"""
+Append-only columnar store for run metadata and raw sram readouts
+
+Layout:
+    store_dir/
+        columns/<column>.bin    one fixed width value per run, raw little endian
+        readouts/<sram>.bin     raw readout words of all runs back to back
+Each run records <sram>_offset and <sram>_len columns pointing into the readout files,
+so readouts are memory mapped and only the requested runs are touched.
+
+Usage:
+    store = ResultStore("results")
+    store.append({"name": "hcd", "freq_sel": 4, "ro_sel": 2, "passed": True}, {"output": output_data})
+    runs = store.where(passed=True, freq_sel=4)
+    cols = store.columns(["name", "run_s"], runs)
+    output = store.readout(runs[0], "output")
+"""
+
+import hashlib
+import os
+import time
+
+import numpy as np
+
+READOUT_SRAMS = ("main", "input", "output")
+READOUT_DTYPE = np.dtype("<u4")
+
+# column name -> (dtype, value used when the run does not provide it)
+RUN_COLUMNS = {
+    "run_id": ("<i8", -1),
+    "timestamp": ("<f8", np.nan),
+    "name": ("S64", b""),
+    "firmware_hash": ("S64", b""),
+    "input_hash": ("S64", b""),
+    "input_frame": ("<i4", -1),  # frame index when the input came from a frame archive
+    "freq_sel": ("<i2", -1),
+    "ro_sel": ("<i2", -1),
+    "scan_rate": ("<f8", np.nan),  # scanned words per second
+    "load_s": ("<f8", np.nan),
+    "run_s": ("<f8", np.nan),
+    "readout_s": ("<f8", np.nan),
+    "check_s": ("<f8", np.nan),
+    "passed": ("?", False),
+    "error": ("S256", b""),  # exception raised by the run, if any
+}
+for _sram in READOUT_SRAMS:
+    RUN_COLUMNS[f"{_sram}_offset"] = ("<i8", 0)
+    RUN_COLUMNS[f"{_sram}_len"] = ("<i8", 0)
+
+
+def file_hash(path):
+    """
+    sha256 hex digest of a file, e.g. a firmware hex dump
+    """
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def data_hash(data_lst):
+    """
+    sha256 hex digest of a data list as stored readout words, e.g. one frame of a frame archive
+    """
+    return hashlib.sha256(np.asarray(data_lst, dtype=READOUT_DTYPE).tobytes()).hexdigest()
+
+
+class ResultStore:
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        os.makedirs(os.path.join(store_dir, "columns"), exist_ok=True)
+        os.makedirs(os.path.join(store_dir, "readouts"), exist_ok=True)
+
+    def _column_path(self, name):
+        return os.path.join(self.store_dir, "columns", f"{name}.bin")
+
+    def _readout_path(self, sram):
+        return os.path.join(self.store_dir, "readouts", f"{sram}.bin")
+
+    @staticmethod
+    def _file_items(path, dtype):
+        if not os.path.exists(path):
+            return 0
+        return os.path.getsize(path) // np.dtype(dtype).itemsize
+
+    def __len__(self):
+        # run_id is written last, so it only counts fully appended runs
+        return self._file_items(self._column_path("run_id"), RUN_COLUMNS["run_id"][0])
+
+    def _truncate(self, path, items, dtype):
+        """
+        drop anything past the last complete run (left over by an interrupted append)
+        """
+        if self._file_items(path, dtype) > items:
+            with open(path, "r+b") as f:
+                f.truncate(items * np.dtype(dtype).itemsize)
+
+    def _fit_column(self, name, items):
+        """
+        make a column file exactly `items` long, padding with the column default
+        (columns added after the store was created start out missing)
+        """
+        dtype, default = RUN_COLUMNS[name]
+        path = self._column_path(name)
+        self._truncate(path, items, dtype)
+        missing = items - self._file_items(path, dtype)
+        if missing > 0:
+            with open(path, "ab") as f:
+                np.full(missing, default, dtype=dtype).tofile(f)
+
+    def append(self, meta: dict, readouts: dict = None):
+        """
+        append one run
+
+        meta: column name -> value, see RUN_COLUMNS, missing columns get their default
+        readouts: sram name -> data list of that sram's readout
+
+        return the run id
+        """
+        readouts = readouts or {}
+        for name, value in meta.items():
+            if name not in RUN_COLUMNS or name == "run_id" or name.endswith(("_offset", "_len")):
+                raise ValueError(f"Unknown result column: {name}")
+            dtype = np.dtype(RUN_COLUMNS[name][0])
+            if dtype.kind == "S":
+                value = value.encode() if isinstance(value, str) else value
+                # numpy would silently truncate, and where() would then miss the run
+                if len(value) > dtype.itemsize:
+                    raise ValueError(
+                        f"Value too long for result column {name}! Length: {len(value)}, column width: {dtype.itemsize}"
+                    )
+        for sram in readouts:
+            if sram not in READOUT_SRAMS:
+                raise ValueError(f"Unknown readout sram: {sram}")
+
+        run_id = len(self)
+        row = {name: default for name, (_, default) in RUN_COLUMNS.items()}
+        row.update(meta)
+        row["run_id"] = run_id
+        if np.isnan(row["timestamp"]):
+            row["timestamp"] = time.time()
+
+        # readouts first, then the columns pointing at them
+        for sram in READOUT_SRAMS:
+            path = self._readout_path(sram)
+            if run_id > 0:
+                last = self._read_column(f"{sram}_offset", [run_id - 1])[0]
+                last += self._read_column(f"{sram}_len", [run_id - 1])[0]
+            else:
+                last = 0
+            self._truncate(path, last, READOUT_DTYPE)
+            row[f"{sram}_offset"] = last
+            data = readouts.get(sram)
+            if data is not None and len(data):
+                data = np.asarray(data, dtype=READOUT_DTYPE)
+                with open(path, "ab") as f:
+                    data.tofile(f)
+                row[f"{sram}_len"] = len(data)
+
+        for name, (dtype, _) in RUN_COLUMNS.items():
+            if name == "run_id":
+                continue
+            path = self._column_path(name)
+            self._fit_column(name, run_id)
+            with open(path, "ab") as f:
+                np.asarray([row[name]], dtype=dtype).tofile(f)
+        with open(self._column_path("run_id"), "ab") as f:
+            np.asarray([run_id], dtype=RUN_COLUMNS["run_id"][0]).tofile(f)
+
+        return run_id
+
+    def _map(self, path, dtype, count):
+        if count == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode="r", shape=(count,))
+
+    def _read_column(self, name, runs=None):
+        if name not in RUN_COLUMNS:
+            raise ValueError(f"Unknown result column: {name}")
+        dtype, default = RUN_COLUMNS[name]
+        count = len(self)
+        stored = min(self._file_items(self._column_path(name), dtype), count)
+        if stored < count:
+            # column added after some runs were stored, those runs read as the default
+            column = np.full(count, default, dtype=dtype)
+            column[:stored] = self._map(self._column_path(name), dtype, stored)
+        else:
+            column = self._map(self._column_path(name), dtype, count)
+        if runs is None:
+            return np.array(column)
+        return np.array(column[np.asarray(runs, dtype=np.int64)])
+
+    def columns(self, names=None, runs=None):
+        """
+        load selected columns for selected runs
+
+        names: list of column names, None for all
+        runs: list of run ids, None for all
+
+        return dict of column name -> ndarray
+        """
+        names = list(RUN_COLUMNS) if names is None else names
+        return {name: self._read_column(name, runs) for name in names}
+
+    def where(self, **conditions):
+        """
+        run ids whose columns equal all given values, e.g. where(passed=True, freq_sel=4)
+        """
+        mask = np.ones(len(self), dtype=bool)
+        for name, value in conditions.items():
+            column = self._read_column(name)
+            if column.dtype.kind == "S" and isinstance(value, str):
+                value = value.encode()
+            mask &= column == value
+        return np.flatnonzero(mask)
+
+    def readout(self, run, sram):
+        """
+        memory mapped readout words of one run, empty if the sram was not read
+        """
+        offset = int(self._read_column(f"{sram}_offset", [run])[0])
+        length = int(self._read_column(f"{sram}_len", [run])[0])
+        total = self._file_items(self._readout_path(sram), READOUT_DTYPE)
+        return self._map(self._readout_path(sram), READOUT_DTYPE, total)[offset : offset + length]
+
+    def readouts(self, sram, runs=None):
+        """
+        iterate over (run id, memory mapped readout) of one sram without loading them all
+        """
+        runs = range(len(self)) if runs is None else runs
+        cols = self.columns([f"{sram}_offset", f"{sram}_len"], runs)
+        total = self._file_items(self._readout_path(sram), READOUT_DTYPE)
+        words = self._map(self._readout_path(sram), READOUT_DTYPE, total)
+        for run, offset, length in zip(runs, cols[f"{sram}_offset"], cols[f"{sram}_len"]):
+            yield int(run), words[offset : offset + length]
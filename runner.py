@@ -0,0 +1,488 @@
+"""
+Run test suites described by manifest files in one Interface session
+
+Manifest format (json, paths relative to the manifest file):
+{
+    "suite": "hcd_loop",
+    "tests": [
+        {
+            "name": "hcd_loop_10000",
+            "firmware": "hcd_test_loop_10000.v",       # main sram hex dump
+            "input": "test_input/image_dump.v",        # input sram hex dump or frame archive, optional
+            "input_frame": 0,                          # frame index when input is a batch_processing.py archive
+            "clkgen": {"freq_sel": 4, "ro_sel": 2},    # optional, skip clkgen config if missing
+            "run": true,                               # run the program after loading, default true
+            "timeout": 60,                             # run_program timeout in seconds
+            "clobbers": ["main"],                      # srams the program may modify, default ["main"] if run
+            "readout": {"output": 1600},               # sram -> words to read, 0 for all, "loaded" for loaded length
+            "checker": {"name": "hcd_binary", "image": "test_input/image.png"},
+            "setup": "run image_processing.py in test_input to generate it"  # shown when a file is missing, optional
+        }
+    ]
+}
+
+Tests are reordered to reuse sram contents that are already loaded, and the hex
+dumps of the next test are parsed in a worker process while the current one runs.
+The worker is started through a forkserver, so scripts using SuiteRunner need an
+`if __name__ == "__main__":` guard.
+
+Usage:
+    python runner.py arith_test/manifest.json dma_test/manifest.json [--sim] [--json report.json]
+"""
+
+import argparse
+import importlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from utils import Config, Interface, Sram, logger, setup_logging
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+LOADABLE_SRAMS = ("main", "input")
+READABLE_SRAMS = ("main", "input", "output")
+
+
+class ManifestTest:
+    """
+    One test entry of a manifest, with paths resolved against the manifest directory
+    """
+
+    def __init__(self, suite, base_dir, entry):
+        self.suite = suite
+        self.base_dir = base_dir
+        self.name = entry["name"]
+        self.firmware = self._path(entry["firmware"])
+        self.input = self._path(entry.get("input"))
+        self.input_frame = entry.get("input_frame")
+        self.clkgen = entry.get("clkgen")
+        self.run = entry.get("run", True)
+        self.timeout = entry.get("timeout", 60)
+        self.clobbers = entry.get("clobbers", ["main"] if self.run else [])
+        self.readout = entry.get("readout", {})
+        checker = entry.get("checker", "none")
+        if isinstance(checker, str):
+            checker = {"name": checker}
+        self.checker = checker
+        self.setup = entry.get("setup")
+
+        for sram in self.readout:
+            if sram not in READABLE_SRAMS:
+                raise ValueError(f"{self.full_name}: unknown readout sram {sram}")
+
+    def _path(self, path):
+        if path is None:
+            return None
+        return os.path.normpath(os.path.join(self.base_dir, path))
+
+    @property
+    def full_name(self):
+        return f"{self.suite}/{self.name}"
+
+    def require(self, path):
+        """
+        raise FileNotFoundError, with the manifest's setup hint, if a file the test needs is missing
+        """
+        if not os.path.exists(path):
+            hint = f", {self.setup}" if self.setup else ""
+            raise FileNotFoundError(f"{self.full_name}: {path} not found{hint}")
+
+    @property
+    def sources(self):
+        """
+        what each loadable sram should contain for this test
+        """
+        if self.input is not None and self.input_frame is not None:
+            # (archive path, frame index) for a frame archive input
+            return {"main": self.firmware, "input": (self.input, self.input_frame)}
+        return {"main": self.firmware, "input": self.input}
+
+
+def load_manifest(path):
+    """
+    Read a manifest file and return its list of ManifestTest
+    """
+    with open(path, "r") as f:
+        manifest = json.load(f)
+    base_dir = os.path.dirname(os.path.abspath(path))
+    suite = manifest.get("suite", os.path.basename(base_dir))
+    return [ManifestTest(suite, base_dir, entry) for entry in manifest["tests"]]
+
+
+def _loaded_after(state, test):
+    """
+    sram contents after running test on top of state
+    """
+    state = dict(state)
+    for sram, source in test.sources.items():
+        if source is not None:
+            state[sram] = source
+    for sram in test.clobbers:
+        state[sram] = None
+    return state
+
+
+def _reuse_count(state, test):
+    return sum(
+        1
+        for sram, source in test.sources.items()
+        if source is not None and state.get(sram) == source
+    )
+
+
+def order_tests(tests):
+    """
+    Greedy ordering: always pick the test that can reuse the most already loaded srams,
+    keeping the manifest order on ties
+    """
+    remaining = list(tests)
+    ordered = []
+    state = dict.fromkeys(LOADABLE_SRAMS)
+    while remaining:
+        best = max(remaining, key=lambda t: _reuse_count(state, t))
+        remaining.remove(best)
+        ordered.append(best)
+        state = _loaded_after(state, best)
+    return ordered
+
+
+# ========= checkers =========
+# checker(test, loaded, readout, **args) -> bool
+#   loaded: {"main": data list, "input": data list or None}
+#   readout: {"main": data list, "input": data list, "output": data list}
+
+
+def check_none(test, loaded, readout):
+    return True
+
+
+def _verify_readout(test, sram, expected, read):
+    """
+    compare a readout with the expected data, logging mismatch diagnostics on failure
+    """
+    # numpy is only needed once a test actually compares data
+    from verify import Verifier
+
+    verifier = Verifier(expected[: len(read)])
+    if not verifier.check_all(read):
+        logger.error(f"{test.full_name}: {sram} sram readout mismatch")
+        verifier.log_report()
+    return verifier.passed
+
+
+def check_loopback(test, loaded, readout):
+    """
+    every read out sram that was loaded matches the loaded data
+    """
+    res = True
+    for sram in LOADABLE_SRAMS:
+        if loaded.get(sram) is None or not readout.get(sram):
+            continue
+        if not _verify_readout(test, sram, loaded[sram], readout[sram]):
+            res = False
+    return res
+
+
+def check_output_equals_input(test, loaded, readout):
+    if loaded.get("input") is None:
+        logger.error(f"{test.full_name}: output_equals_input needs an input in the manifest")
+        return False
+    output = readout.get("output") or []
+    return _verify_readout(test, "output", loaded["input"], output)
+
+
+def check_hcd_binary(test, loaded, readout, image=None, output_dir="test_output"):
+    """
+    hcd output is a 0/1 corner map, optionally render it over the original image
+    """
+    output = readout.get("output") or []
+    if any(val not in (0, 1) for val in output):
+        logger.error(f"{test.full_name}: hcd output is not binary")
+        return False
+    if image is not None:
+        test.require(os.path.join(test.base_dir, image))
+        sys.path.append(os.path.join(ROOT_DIR, "hcd_test"))
+        from hcd_output_process import hcd_output_process
+
+        hcd_output_process(
+            os.path.join(test.base_dir, image),
+            output,
+            output_img_path=os.path.join(test.base_dir, output_dir),
+            output_img_name=f"{test.name}.png",
+        )
+    return True
+
+
+CHECKERS = {
+    "none": check_none,
+    "loopback": check_loopback,
+    "output_equals_input": check_output_equals_input,
+    "hcd_binary": check_hcd_binary,
+}
+
+
+def get_checker(test):
+    """
+    look up a checker by name, "module:function" imports a checker next to the manifest
+    """
+    args = dict(test.checker)
+    name = args.pop("name")
+    if ":" in name:
+        module_name, func_name = name.split(":")
+        if test.base_dir not in sys.path:
+            sys.path.append(test.base_dir)
+        return getattr(importlib.import_module(module_name), func_name), args
+    if name not in CHECKERS:
+        raise ValueError(f"{test.full_name}: unknown checker {name}")
+    return CHECKERS[name], args
+
+
+# ========= runner =========
+
+# frame archives opened by this process, kept open across tests in the parse worker
+_archives = {}
+
+
+def _parse_source(sram: Sram, source):
+    """
+    parse what a sram should contain, runs in the parse worker process
+
+    source: hex dump path, or (archive path, frame index) for a frame archive
+    """
+    if isinstance(source, tuple):
+        path, index = source
+        if path not in _archives:
+            sys.path.append(os.path.join(ROOT_DIR, "hcd_test", "test_input"))
+            from batch_processing import FrameArchive
+
+            _archives[path] = FrameArchive(path)
+        return _archives[path][index]
+    return sram.hex_dump_to_data(Config.read_hex_dump(source))
+
+
+class SuiteRunner:
+    def __init__(self, interface: Interface, store=None):
+        """
+        interface: the Interface session to run all tests in
+        store: optional result_store.ResultStore to append every run to
+        """
+        self.interface = interface
+        self.store = store
+        self.loaded = dict.fromkeys(LOADABLE_SRAMS)  # source currently in each sram
+        self._parsed = {}  # (sram, source) -> future of parsed data list
+        self._hashes = {}  # hex dump path -> sha256
+        self._executor = None  # parse worker pool, only while run() is running
+
+    def prepare(self, test):
+        """
+        start parsing the hex dumps of test, in the parse worker while run() is running,
+        parsed data is cached per file
+        """
+        for sram, source in test.sources.items():
+            if source is not None and (sram, source) not in self._parsed:
+                sram_obj = getattr(self.interface, f"{sram}_sram")
+                if self._executor is not None:
+                    future = self._executor.submit(_parse_source, sram_obj, source)
+                else:
+                    future = Future()
+                    try:
+                        future.set_result(_parse_source(sram_obj, source))
+                    except Exception as e:
+                        future.set_exception(e)
+                self._parsed[(sram, source)] = future
+
+    def _data(self, test):
+        self.prepare(test)
+        return {
+            sram: None if source is None else self._parsed[(sram, source)].result()
+            for sram, source in test.sources.items()
+        }
+
+    def run_test(self, test):
+        result = {"name": test.full_name, "passed": False, "error": None, "reused": []}
+        to_load = {}
+        readout = {}
+        try:
+            test.require(test.firmware)
+            if test.input is not None:
+                test.require(test.input)
+            data = self._data(test)
+            # time the scan only, not waiting for the parse worker
+            start = time.perf_counter()
+            for sram in LOADABLE_SRAMS:
+                if data[sram] is not None and self.loaded[sram] == test.sources[sram]:
+                    result["reused"].append(sram)
+                    to_load[sram] = None
+                else:
+                    to_load[sram] = data[sram]
+            # contents are unknown until the load completes
+            for sram, sram_data in to_load.items():
+                if sram_data is not None:
+                    self.loaded[sram] = None
+            self.interface.load_in_srams(to_load["main"], to_load["input"])
+            self.loaded = _loaded_after(self.loaded, test)
+            result["load_s"] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            if test.clkgen is not None:
+                self.interface.config_clkgen(**test.clkgen)
+            completed = True
+            if test.run:
+                completed = self.interface.run_program(timeout=test.timeout)
+            result["run_s"] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            read_len = {}
+            for sram in READABLE_SRAMS:
+                length = test.readout.get(sram)
+                if length == "loaded":
+                    length = len(data[sram]) if data.get(sram) is not None else None
+                read_len[sram] = length
+            main_read, input_read, output_read = self.interface.load_out_data(
+                read_len["main"], read_len["input"], read_len["output"]
+            )
+            readout = {"main": main_read, "input": input_read, "output": output_read}
+            result["readout_s"] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            checker, args = get_checker(test)
+            result["passed"] = completed and bool(checker(test, data, readout, **args))
+            result["check_s"] = time.perf_counter() - start
+        except Exception as e:
+            logger.exception(f"{test.full_name} failed with an exception")
+            result["error"] = repr(e)
+            if "readout_s" not in result:
+                # failed mid scan, sram contents are unknown
+                self.loaded = dict.fromkeys(LOADABLE_SRAMS)
+
+        # failed runs are stored too, with whatever phases completed
+        if self.store is not None:
+            self._store_result(test, result, to_load, readout)
+        return result
+
+    def _file_hash(self, path):
+        from result_store import file_hash
+
+        if not os.path.exists(path):
+            return ""  # e.g. a failed run with a missing dump
+        if path not in self._hashes:
+            self._hashes[path] = file_hash(path)
+        return self._hashes[path]
+
+    def _store_result(self, test, result, to_load, readout):
+        from result_store import data_hash
+
+        meta = {
+            "name": test.full_name,
+            "firmware_hash": self._file_hash(test.firmware),
+            "passed": result["passed"],
+        }
+        if test.input_frame is not None:
+            # hash the frame itself, the archive hash is shared by all its frames
+            meta["input_frame"] = test.input_frame
+            frame = self._parsed.get(("input", test.sources["input"]))
+            if frame is not None and frame.done() and frame.exception() is None:
+                meta["input_hash"] = data_hash(frame.result())
+        elif test.input is not None:
+            meta["input_hash"] = self._file_hash(test.input)
+        if result["error"] is not None:
+            # keep the error text within the column width
+            meta["error"] = result["error"].encode()[:256]
+        if "readout_s" in result:
+            scanned = sum(len(d) for d in to_load.values() if d is not None)
+            scanned += sum(len(d) for d in readout.values())
+            scan_s = result["load_s"] + result["readout_s"]
+            meta["scan_rate"] = scanned / scan_s if scan_s > 0 else float("nan")
+        if test.clkgen is not None:
+            meta["freq_sel"] = test.clkgen["freq_sel"]
+            meta["ro_sel"] = test.clkgen["ro_sel"]
+        for key in ("load_s", "run_s", "readout_s", "check_s"):
+            if key in result:
+                meta[key] = result[key]
+        try:
+            result["run_id"] = self.store.append(meta, readout)
+        except ValueError as e:
+            logger.error(f"{test.full_name}: could not store result: {e}")
+
+    def run(self, tests):
+        """
+        run tests in reuse order, parsing the next test's data while the current one runs
+        """
+        tests = order_tests(tests)
+        self.interface.clear_inputs()
+        results = []
+        # a process, so parsing does not compete with the GPIO bit-banging for the GIL,
+        # started through a forkserver since the overlay may already be mapped here
+        with ProcessPoolExecutor(
+            max_workers=1, mp_context=multiprocessing.get_context("forkserver")
+        ) as executor:
+            self._executor = executor
+            try:
+                for i, test in enumerate(tests):
+                    self.prepare(test)
+                    if i + 1 < len(tests):
+                        self.prepare(tests[i + 1])
+                    logger.info(f"Running test {test.full_name}")
+                    results.append(self.run_test(test))
+            finally:
+                self._executor = None
+        return results
+
+
+def print_report(results):
+    print(
+        f"{'test':<32} {'result':<6} {'load(s)':>8} {'run(s)':>8} {'read(s)':>8} {'check(s)':>8}  reused"
+    )
+    for r in results:
+        status = "\033[92mPASS\033[0m  " if r["passed"] else "\033[91mFAIL\033[0m  "
+        timings = " ".join(
+            f"{r[key]:>8.3f}" if key in r else f"{'-':>8}"
+            for key in ("load_s", "run_s", "readout_s", "check_s")
+        )
+        print(f"{r['name']:<32} {status} {timings}  {','.join(r['reused']) or '-'}")
+        if r["error"] is not None:
+            print(f"    error: {r['error']}")
+    passed = sum(r["passed"] for r in results)
+    print(f"{passed}/{len(results)} tests passed")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run test manifests in one session")
+    parser.add_argument("manifests", nargs="+", help="manifest json files")
+    parser.add_argument("--sim", action="store_true", help="run against the simulated chip")
+    parser.add_argument("--json", help="also write the report to this json file")
+    parser.add_argument("--store", help="append runs and readouts to this result store directory")
+    parser.add_argument("--log", help="also write a debug log to this file")
+    args = parser.parse_args()
+
+    setup_logging(args.log)
+
+    tests = []
+    for manifest in args.manifests:
+        tests.extend(load_manifest(manifest))
+
+    if args.sim:
+        from sim import SimChip
+
+        chip = SimChip()
+        interface = Interface(clkgen=chip.clkgen, iopad=chip.iopad)
+    else:
+        interface = Interface()
+
+    store = None
+    if args.store:
+        from result_store import ResultStore
+
+        store = ResultStore(args.store)
+
+    results = SuiteRunner(interface, store).run(tests)
+    print_report(results)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    sys.exit(0 if all(r["passed"] for r in results) else 1)
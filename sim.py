@@ -0,0 +1,204 @@
+"""
+Simulated GPIO backend for running the scan stack without the board
+
+Usage:
+    chip = SimChip()
+    interface = Interface(clkgen=chip.clkgen, iopad=chip.iopad)
+"""
+
+from host_utils import (
+    SRAM_WORD_WIDTH,
+    MAINROW_COUNT,
+    INPUT_ROW_COUNT,
+    OUTPUT_ROW_COUNT,
+    SCAN_CTRL_BITS,
+    SCAN_ADDR_BITS,
+    SCAN_DATA_BITS,
+    SCAN_ID_MAP,
+)
+
+SCAN_MASK_BITS = SRAM_WORD_WIDTH // 8
+SCAN_PAYLOAD_BITS = SCAN_ADDR_BITS + SCAN_DATA_BITS + 2 + SCAN_MASK_BITS
+SRAM_ROW_COUNTS = {
+    "main": MAINROW_COUNT,
+    "input": INPUT_ROW_COUNT,
+    "output": OUTPUT_ROW_COUNT,
+}
+
+# pin names in the same order as the AxiGPIO channels used by utils.Interface
+CLKGEN_CHANNEL1 = ("scanclk", "clksel", "cg_scanin", "cg_scanclk", "enablecommon", "globalenableb")
+CLKGEN_CHANNEL2 = ("cg_scanout",)
+IOPAD_CHANNEL1 = (
+    "reset",
+    "programDone",
+    "hcdScanIN",
+    "hcdScanOut",
+    "coreInterrupt",
+    "testMode",
+    "scanInValid",
+    "scanInPayload",
+    "scanLoad",
+    "scanRead",
+    "scanReset",
+    "jtagDummy",
+    "chainSelEn",
+    "scanOutValid",
+    "scanOutPayload",
+)
+
+
+class SimPin:
+    """
+    A single GPIO pin, mimics the pin object returned by AxiGPIO channels
+    """
+
+    def __init__(self, chip, name):
+        self.chip = chip
+        self.name = name
+
+    def on(self):
+        self.chip.set_pin(self.name, 1)
+
+    def off(self):
+        self.chip.set_pin(self.name, 0)
+
+    def write(self, value):
+        self.chip.set_pin(self.name, int(value))
+
+    def read(self):
+        return self.chip.read_pin(self.name)
+
+
+class SimGpio:
+    """
+    Mimics an AxiGPIO with channel1 and channel2
+    """
+
+    def __init__(self, chip, channel1, channel2=()):
+        self.channel1 = [SimPin(chip, name) for name in channel1]
+        self.channel2 = [SimPin(chip, name) for name in channel2]
+
+
+class SimChip:
+    """
+    Behavioural model of the scan chain and SRAMs
+
+    Every scan clock rising edge performs one of (in priority order):
+        scanReset:   clear the ctrl and payload shift registers
+        chainSelEn:  shift scanInPayload into the scan ctrl register
+        scanLoad:    execute the payload on the selected write chain
+        scanRead:    capture the SRAM read latch into the scan out register
+        scanInValid: shift scanInPayload into the payload register and scan out register
+
+    The program is considered done after `program_polls` reads of programDone
+    once reset is released on the internal clock. `program` is an optional
+    callable(chip) applied to the SRAMs when the program starts.
+    """
+
+    def __init__(self, program=None, program_polls=1):
+        self.program = program
+        self.program_polls = program_polls
+        self.ops = 0  # number of GPIO pin accesses
+
+        self.pins = dict.fromkeys(CLKGEN_CHANNEL1 + CLKGEN_CHANNEL2 + IOPAD_CHANNEL1, 0)
+        self.srams = {name: [0] * count for name, count in SRAM_ROW_COUNTS.items()}
+        self.chain_names = {}
+        for name, ids in SCAN_ID_MAP.items():
+            self.chain_names[ids["read"]] = name
+            self.chain_names[ids["write"]] = name
+        self.dout = dict.fromkeys(SRAM_ROW_COUNTS, 0)
+
+        self.ctrl = 0
+        self.payload = 0
+        self.scan_out = 0
+        self.scan_out_valid = 0
+        self.cg_chain = 0
+        self._program_started = False
+        self._polls_left = 0
+
+        self.clkgen = SimGpio(self, CLKGEN_CHANNEL1, CLKGEN_CHANNEL2)
+        self.iopad = SimGpio(self, IOPAD_CHANNEL1)
+
+    def reset_ops(self):
+        self.ops = 0
+
+    def set_pin(self, name, value):
+        self.ops += 1
+        rising = value and not self.pins[name]
+        self.pins[name] = value
+        if rising:
+            if name == "scanclk":
+                self._tick_scan()
+            elif name == "cg_scanclk":
+                self.cg_chain = ((self.cg_chain << 1) | self.pins["cg_scanin"]) & 0x3FFFF
+        if name == "reset" and value:
+            self._program_started = False
+
+    def read_pin(self, name):
+        self.ops += 1
+        if name == "scanOutPayload":
+            return self.scan_out & 1
+        elif name == "scanOutValid":
+            return self.scan_out_valid
+        elif name == "programDone":
+            return self._program_done()
+        elif name == "cg_scanout":
+            return (self.cg_chain >> 17) & 1
+        return self.pins[name]
+
+    def _program_done(self):
+        if self.pins["reset"] or self.pins["clksel"]:
+            return 0
+        if not self._program_started:
+            self._program_started = True
+            self._polls_left = self.program_polls
+            if self.program is not None:
+                self.program(self)
+        if self._polls_left > 0:
+            self._polls_left -= 1
+            return 0
+        return 1
+
+    def _tick_scan(self):
+        pins = self.pins
+        bit = pins["scanInPayload"]
+        if pins["scanReset"]:
+            self.ctrl = 0
+            self.payload = 0
+            self.scan_out_valid = 0
+        elif pins["chainSelEn"]:
+            self.ctrl = (self.ctrl >> 1) | (bit << (SCAN_CTRL_BITS - 1))
+        elif pins["scanLoad"]:
+            self._load_payload()
+        elif pins["scanRead"]:
+            name = self.chain_names.get(self.ctrl)
+            self.scan_out = self.dout[name] if name is not None else 0
+            self.scan_out_valid = 1
+        elif pins["scanInValid"]:
+            self.payload = (self.payload >> 1) | (bit << (SCAN_PAYLOAD_BITS - 1))
+            self.scan_out >>= 1
+
+    def _load_payload(self):
+        name = self.chain_names.get(self.ctrl)
+        if name is None or SCAN_ID_MAP[name]["write"] != self.ctrl:
+            return
+        payload = self.payload
+        mask = payload & ((1 << SCAN_MASK_BITS) - 1)
+        payload >>= SCAN_MASK_BITS
+        write = payload & 1
+        enable = (payload >> 1) & 1
+        payload >>= 2
+        data = payload & ((1 << SCAN_DATA_BITS) - 1)
+        addr = payload >> SCAN_DATA_BITS
+        if not enable:
+            return
+        sram = self.srams[name]
+        if write:
+            word = sram[addr]
+            for i in range(SCAN_MASK_BITS):
+                if mask >> i & 1:
+                    byte_mask = 0xFF << (8 * i)
+                    word = (word & ~byte_mask) | (data & byte_mask)
+            sram[addr] = word
+        else:
+            self.dout[name] = sram[addr]
@@ -0,0 +1,168 @@
+"""
+Off-board tests of the scan stack against the simulated chip (sim.py)
+
+Usage:
+    python -m pytest
+"""
+
+import pytest
+
+from result_store import ResultStore
+from sim import SimChip
+from utils import FULL_MASK, Interface
+from verify import Verifier
+
+DATA = [(0x11223344 + 0x01010101 * i) & 0xFFFFFFFF for i in range(40)]
+
+
+@pytest.fixture
+def chip():
+    return SimChip()
+
+
+@pytest.fixture
+def interface(chip):
+    return Interface(clkgen=chip.clkgen, iopad=chip.iopad)
+
+
+# ========= masked writes =========
+
+
+def test_load_and_read_back(chip, interface):
+    interface.load_in_srams(main_sram_data=DATA, input_sram_data=DATA[::-1])
+    assert chip.srams["main"][: len(DATA)] == DATA
+    main_read, input_read, _ = interface.load_out_data(len(DATA), len(DATA), None)
+    assert main_read == DATA
+    assert input_read == DATA[::-1]
+
+
+def test_update_sram_writes_only_changed_bytes(chip, interface):
+    interface.load_in_srams(input_sram_data=DATA)
+    new_data = list(DATA)
+    new_data[3] = (new_data[3] & ~0xFF00) | 0xAB00
+    new_data[7] ^= 0xFF000000
+    # a byte the diff leaves alone must survive the masked write
+    chip.srams["input"][3] = (DATA[3] & ~0xFF) | 0x5A
+
+    assert interface.update_sram(interface.input_sram, DATA, new_data) == 2
+    assert chip.srams["input"][3] == (new_data[3] & ~0xFF) | 0x5A
+    assert chip.srams["input"][7] == new_data[7]
+
+
+def test_write_sram_bytes(chip, interface):
+    interface.load_in_srams(input_sram_data=DATA)
+    interface.write_sram_bytes(interface.input_sram, {0: 0xEE, 5: 0x55})
+    assert chip.srams["input"][0] == (DATA[0] & ~0xFF) | 0xEE
+    assert chip.srams["input"][1] == (DATA[1] & ~0xFF00) | 0x5500
+    assert chip.srams["input"][2:4] == DATA[2:4]
+
+
+@pytest.mark.parametrize(
+    "write",
+    [
+        (2048, 0, FULL_MASK),  # address past the input sram
+        (-1, 0, FULL_MASK),
+        (0, 1 << 32, FULL_MASK),
+        (0, -1, FULL_MASK),
+        (0, 0, FULL_MASK + 1),
+    ],
+)
+def test_invalid_writes_are_rejected_before_scanning(chip, interface, write):
+    chip.reset_ops()
+    with pytest.raises(ValueError):
+        interface._scan_masked_to_sram(interface.input_sram, [write])
+    assert chip.ops == 0
+
+
+# ========= verifier =========
+
+
+def test_verifier_passes_on_match(chip, interface):
+    interface.load_in_srams(input_sram_data=DATA)
+    verifier = Verifier(DATA)
+    interface.load_out_data(None, len(DATA), None, verifiers={"input": verifier})
+    assert verifier.passed
+    assert verifier.checked == len(DATA)
+
+
+def test_verifier_diagnoses_address_offset(chip, interface):
+    # every word read back comes from the next address
+    interface.load_in_srams(input_sram_data=DATA[1:] + [0])
+    verifier = Verifier(DATA)
+    interface.load_out_data(None, len(DATA), None, verifiers={"input": verifier})
+    assert not verifier.passed
+    assert "readout comes from address offset +1" in verifier.diagnose()
+
+
+def test_verifier_diagnoses_stuck_bit(chip, interface):
+    interface.load_in_srams(input_sram_data=[word | 1 << 5 for word in DATA])
+    verifier = Verifier(DATA)
+    verifier.check_all(interface.load_out_data(None, len(DATA), None)[1])
+    assert "bit 5 stuck at 1" in verifier.diagnose()
+
+
+def test_verifier_stops_at_max_mismatches(chip, interface):
+    interface.load_in_srams(input_sram_data=[word ^ 1 for word in DATA])
+    verifier = Verifier(DATA, max_mismatches=5, chunk_size=8)
+    _, input_read, _ = interface.load_out_data(
+        None, len(DATA), None, verifiers={"input": verifier}
+    )
+    assert len(input_read) == 5
+    assert verifier.aborted
+
+
+def test_readout_longer_than_expected_leaves_test_mode(chip, interface):
+    with pytest.raises(ValueError):
+        interface.load_out_data(None, 10, None, verifiers={"input": Verifier(DATA[:5])})
+    assert interface.testMode.read() == 0
+    assert interface.scanInValid.read() == 0
+
+
+# ========= result store =========
+
+
+def test_store_round_trip(chip, interface, tmp_path):
+    store = ResultStore(tmp_path)
+    interface.load_in_srams(input_sram_data=DATA)
+    _, input_read, _ = interface.load_out_data(None, len(DATA), None)
+
+    store.append({"name": "loopback", "passed": True}, {"input": input_read})
+    store.append({"name": "failed", "error": "RuntimeError('boom')"})
+    assert len(store) == 2
+    assert list(store.where(passed=True)) == [0]
+    assert list(store.readout(0, "input")) == DATA
+    assert len(store.readout(1, "input")) == 0
+
+
+def test_store_recovers_from_interrupted_append(tmp_path):
+    store = ResultStore(tmp_path)
+    store.append({"name": "first"}, {"output": [1, 2, 3]})
+    # an append interrupted after the readout and one column were written
+    with open(store._readout_path("output"), "ab") as f:
+        f.write(b"\0" * 8)
+    with open(store._column_path("name"), "ab") as f:
+        f.write(b"x" * 64)
+    assert len(store) == 1
+
+    store.append({"name": "second"}, {"output": [4]})
+    assert list(store.columns(["name"])["name"]) == [b"first", b"second"]
+    assert list(store.readout(1, "output")) == [4]
+
+
+def test_store_pads_columns_added_later(tmp_path):
+    store = ResultStore(tmp_path)
+    store.append({"name": "old"})
+    # a store written before the error column existed
+    (tmp_path / "columns" / "error.bin").unlink()
+    assert list(store.columns(["error"])["error"]) == [b""]
+
+    store.append({"name": "new", "error": "boom"})
+    assert list(store.columns(["error"])["error"]) == [b"", b"boom"]
+    assert list(store.where(error="boom")) == [1]
+
+
+def test_store_rejects_oversized_strings(tmp_path):
+    store = ResultStore(tmp_path)
+    with pytest.raises(ValueError):
+        store.append({"name": "x" * 65})
+    assert len(store) == 0
@@ -1,126 +1,128 @@
 import logging
 import time
-import math
 
-from pynq import Overlay
-from pynq.lib import AxiGPIO
+# host-side helpers, re-exported so `from utils import *` scripts keep working
+from host_utils import (
+    SRAM_WORD_WIDTH,
+    MAINROW_COUNT,
+    MAIN_COLMUX,
+    INPUT_ROW_COUNT,
+    INPUT_COLMUX,
+    OUTPUT_ROW_COUNT,
+    OUTPUT_COLMUX,
+    SCANCHAIN_IDS,
+    SCAN_CTRL_BITS,
+    SCAN_ADDR_BITS,
+    SCAN_DATA_BITS,
+    SCAN_ID_MAP,
+    BYTES_PER_WORD,
+    FULL_MASK,
+    FULL_MASK_STR,
+    Config,
+    Sram,
+    gen_scan_payload_str,
+    mask_to_str,
+    bytes_to_masked_writes,
+    compile_masked_writes,
+    diff_to_masked_writes,
+    is_same_data,
+)
+
+__all__ = [
+    # host_utils re-exports
+    "SRAM_WORD_WIDTH",
+    "MAINROW_COUNT",
+    "MAIN_COLMUX",
+    "INPUT_ROW_COUNT",
+    "INPUT_COLMUX",
+    "OUTPUT_ROW_COUNT",
+    "OUTPUT_COLMUX",
+    "SCANCHAIN_IDS",
+    "SCAN_CTRL_BITS",
+    "SCAN_ADDR_BITS",
+    "SCAN_DATA_BITS",
+    "SCAN_ID_MAP",
+    "BYTES_PER_WORD",
+    "FULL_MASK",
+    "FULL_MASK_STR",
+    "Config",
+    "Sram",
+    "gen_scan_payload_str",
+    "mask_to_str",
+    "bytes_to_masked_writes",
+    "compile_masked_writes",
+    "diff_to_masked_writes",
+    "is_same_data",
+    # modules test scripts got from `from utils import *` before the split
+    "logging",
+    "time",
+    # utils
+    "OVERLAY_PATH",
+    "DEFAULT_LOG_FILE",
+    "logger",
+    "setup_logging",
+    "Interface",
+]
 
 # Constants
 OVERLAY_PATH = "/home/xilinx/standard_io.bit"
-SRAM_WORD_WIDTH = 32
-MAINROW_COUNT = 4096
-MAIN_COLMUX = 8
-INPUT_ROW_COUNT = 2048
-INPUT_COLMUX = 8
-OUTPUT_ROW_COUNT = 2048
-OUTPUT_COLMUX = 8
-SCANCHAIN_IDS = range(9)  # total ids in the scan chain
-SCAN_CTRL_BITS = 8  # number of bits in the scan control
-SCAN_ADDR_BITS = 16
-SCAN_DATA_BITS = 32
-SCAN_ID_MAP = {
-    "main": {"read": 0, "write": 1},
-    "input": {"read": 2, "write": 3},
-    "output": {"read": 4, "write": 5},
-}
-
-# Create a logger
-logger = logging.getLogger()
-logger.setLevel(logging.DEBUG)  # Set the logging level
-# Create handlers
-file_handler = logging.FileHandler("logfile.log")  # Log to a file
-stdout_handler = logging.StreamHandler()  # Log to stdout
-# Set logging levels for handlers
-file_handler.setLevel(logging.DEBUG)
-stdout_handler.setLevel(logging.INFO)
-# Create a logging format
-formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)-8s - %(message)s")
-file_handler.setFormatter(formatter)
-stdout_handler.setFormatter(formatter)
-# Add handlers to the logger
-logger.addHandler(file_handler)
-logger.addHandler(stdout_handler)
-logger.debug("========= utils logger initialized =========")
-
-
-class Config:
-    @staticmethod
-    def read_hex_dump(file_path):
-        """
-        Read hex dump file and return a list of hex values
-        """
-        hex_data = []
-        with open(file_path, "r") as f:
-            lines = f.readlines()
-            for line in lines:
-                if line.startswith("@"):
-                    continue
-                else:
-                    hex_data.extend(line.split())
-        return hex_data
-
-    def __init__(self, c_test_dump, data_dump=None):
-        logger.debug(
-            f"Initializing Config with c_test_dump: {c_test_dump}, data_dump: {data_dump}"
-        )
-        self.c_hexdump = self.read_hex_dump(c_test_dump)
-        if data_dump is not None:
-            self.data_hexdump = self.read_hex_dump(data_dump)
-        else:
-            self.data_hexdump = None
+DEFAULT_LOG_FILE = "logfile.log"
 
+logger = logging.getLogger()
+_logging_set_up = False
 
-class Interface:
 
-    class Sram:
-        def __init__(self, row_count, colmux, id_read, id_write, word_width=32):
-            logger.debug(
-                f"Initializing SRAM with row_count: {row_count}, colmux: {colmux}, id_read: {id_read}, id_write: {id_write}, word_width: {word_width}"
-            )
-            self.row_count = row_count
-            self.colmux = colmux
-            self.id_read = id_read
-            self.id_write = id_write
-            assert self.id_write == self.id_read + 1, "id_write should be id_read + 1"
-
-        def hex_dump_to_data(self, hexdump):
-            """
-            parse a list of hex values to a list of data values in accordance to the sram config
-
-            hexdump: list of 8bit hex values (e.g. ['08', 'a0', '10', 'ff'])
-            """
-            data_per_word = SRAM_WORD_WIDTH / 8
-            if not data_per_word.is_integer():
-                raise ValueError(
-                    f"word_width must be a multiple of 8! Received word width: {SRAM_WORD_WIDTH}"
-                )
-            data_per_word = int(data_per_word)
+def setup_logging(log_file=DEFAULT_LOG_FILE):
+    """
+    log DEBUG and up to log_file (None for no file) and INFO and up to stdout
 
-            row_needed = math.ceil(len(hexdump) / data_per_word)
-            if row_needed >= self.row_count:
-                raise ValueError(
-                    f"Data length is too long for the SRAM! Data length: {row_needed}, SRAM row count: {self.row_count}"
-                )
+    only the first call adds handlers, so entry points can pick the log file
+    before Interface() sets up the default one on the board
+    """
+    global _logging_set_up
+    if _logging_set_up:
+        return
+    _logging_set_up = True
+
+    logger.setLevel(logging.DEBUG)  # Set the logging level
+    # Create a logging format
+    formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)-8s - %(message)s")
+    # Log to stdout
+    stdout_handler = logging.StreamHandler()
+    stdout_handler.setLevel(logging.INFO)
+    stdout_handler.setFormatter(formatter)
+    logger.addHandler(stdout_handler)
+    if log_file is not None:
+        # Log to a file
+        file_handler = logging.FileHandler(log_file)
+        file_handler.setLevel(logging.DEBUG)
+        file_handler.setFormatter(formatter)
+        logger.addHandler(file_handler)
+    logger.debug("========= utils logger initialized =========")
 
-            result_lst = []
-            data = 0
-            for i in range(len(hexdump)):
-                data = data | int(hexdump[i], 16) << (8 * (i % data_per_word))
-                if (i + 1) % data_per_word == 0:
-                    result_lst.append(data)
-                    data = 0
 
-            # left over
-            if len(hexdump) % data_per_word != 0:
-                result_lst.append(data)
+class Interface:
 
-            return result_lst
+    Sram = Sram
 
-    def __init__(self):
+    def __init__(self, clkgen=None, iopad=None):
+        """
+        clkgen: clkgen AxiGPIO, loaded from the overlay if None
+        iopad: iopad AxiGPIO, loaded from the overlay if None
+        """
+        on_board = clkgen is None or iopad is None
+        if on_board:
+            # board scripts get logfile.log without further setup
+            setup_logging()
         logger.debug("Initializing Interface")
-        overlay = Overlay(OVERLAY_PATH)
-        clkgen = AxiGPIO(overlay.ip_dict["clkgen"])
-        iopad = AxiGPIO(overlay.ip_dict["iopad"])
+        if on_board:
+            # only import pynq when talking to the board
+            from pynq import Overlay
+            from pynq.lib import AxiGPIO
+
+            overlay = Overlay(OVERLAY_PATH)
+            clkgen = AxiGPIO(overlay.ip_dict["clkgen"])
+            iopad = AxiGPIO(overlay.ip_dict["iopad"])
 
         # clkgen
         self.cg_scanout = clkgen.channel2[0]
@@ -284,34 +286,7 @@ class Interface:
                 self.scanInPayload.off()
             self._tick_scan_clk()
 
-    @staticmethod
-    def _gen_scan_payload_str(
-        addr: int, data: int, enable: bool, write: bool, mask: str
-    ):
-        """
-        Generate scan chain scan in payload string
-
-        addr: address to write/read
-        data: data to write
-        enable: enable the SRAM
-        write: write (1) or read (0)
-        mask: read/write mask (4 bits for now)
-        """
-        # read/wrie address
-        addr = format(addr, f"0{SCAN_ADDR_BITS}b")
-        # write data, set to 0 if read
-        data = format(data, f"0{SCAN_DATA_BITS}b")
-        # enable the SRAM
-        enable = format(enable, "01b")
-        # write (1) or read (0)
-        write = format(write, "01b")
-        # read/write mask (4 bits for now)
-        mask = mask
-
-        # payload str
-        payload_str = addr + data + enable + write + mask
-
-        return payload_str
+    _gen_scan_payload_str = staticmethod(gen_scan_payload_str)
 
     def _scan_ctrl(self, id):
         """
@@ -380,7 +355,7 @@ class Interface:
             # scan write in reset data
             self.scanInValid.on()
             payload_str = self._gen_scan_payload_str(
-                addr=0, data=0, enable=False, write=False, mask="1111"
+                addr=0, data=0, enable=False, write=False, mask=FULL_MASK_STR
             )
             self._scan_write(payload_str)
             self.scanInValid.off()
@@ -400,7 +375,28 @@ class Interface:
         sram: the sram object
         data_lst: the data list to write
         """
-        logger.debug(f"Writing data to SRAM: {sram.id_write}")
+        self._scan_masked_to_sram(
+            sram, [(addr, data, FULL_MASK) for addr, data in enumerate(data_lst)]
+        )
+
+    def _scan_masked_to_sram(self, sram: Sram, writes: list):
+        """
+        Write masked words to sram through scan chain, same pre assumption as _scan_to_sram
+
+        sram: the sram object
+        writes: list of (address, data, byte mask), bit i of the mask enables byte i, see mask_to_str
+        """
+        sram.check_writes(writes)
+        self._scan_payloads_to_sram(sram, compile_masked_writes(writes))
+
+    def _scan_payloads_to_sram(self, sram: Sram, payload_strs: list):
+        """
+        Scan already generated write payloads to sram, same pre assumption as _scan_to_sram
+
+        sram: the sram object
+        payload_strs: list of payload strings from gen_scan_payload_str / compile_masked_writes
+        """
+        logger.debug(f"Writing {len(payload_strs)} words to SRAM: {sram.id_write}")
 
         # reset scan
         self._scan_reset()
@@ -414,10 +410,7 @@ class Interface:
 
         # scan write in data
         self.scanInValid.on()
-        for addr in range(len(data_lst)):
-            payload_str = self._gen_scan_payload_str(
-                addr=addr, data=data_lst[addr], enable=True, write=True, mask="1111"
-            )
+        for payload_str in payload_strs:
             self._scan_write(payload_str)
         self.scanInValid.off()
         self._tick_scan_clk()
@@ -429,6 +422,20 @@ class Interface:
     def load_in_data(self, config: Config):
         logger.info("Loading in data")
 
+        main_sram_data = self.main_sram.hex_dump_to_data(config.c_hexdump)
+        if config.data_hexdump is not None:
+            input_sram_data = self.input_sram.hex_dump_to_data(config.data_hexdump)
+        else:
+            input_sram_data = None
+
+        self.load_in_srams(main_sram_data, input_sram_data)
+
+        return main_sram_data, input_sram_data
+
+    def _prepare_scan_in(self):
+        """
+        hold the chip in reset on the external clock and clear the scan chains before scanning in
+        """
         # switch to external clock to manually tick the clock
         self.select_external_clk()
 
@@ -439,22 +446,65 @@ class Interface:
         # reset scan chains
         self._scan_reset_regs()
 
+    def load_in_srams(self, main_sram_data: list = None, input_sram_data: list = None):
+        """
+        scan already parsed data into the srams, None to leave the sram untouched
+
+        main_sram_data: data list for main sram
+        input_sram_data: data list for input sram
+        """
+        self._prepare_scan_in()
+
         # scan to main sram
-        logger.info("Loading in main SRAM data")
-        main_sram_data = self.main_sram.hex_dump_to_data(config.c_hexdump)
-        logger.debug(f"main sram data: {main_sram_data}")
-        self._scan_to_sram(self.main_sram, main_sram_data)
+        if main_sram_data is not None:
+            logger.info("Loading in main SRAM data")
+            logger.debug(f"main sram data: {main_sram_data}")
+            self._scan_to_sram(self.main_sram, main_sram_data)
 
         # scan to input sram
-        logger.info("Loading in input SRAM data")
-        if config.data_hexdump is not None:
-            input_sram_data = self.input_sram.hex_dump_to_data(config.data_hexdump)
+        if input_sram_data is not None:
+            logger.info("Loading in input SRAM data")
             logger.debug(f"input sram data: {input_sram_data}")
             self._scan_to_sram(self.input_sram, input_sram_data)
-        else:
-            input_sram_data = None
 
-        return main_sram_data, input_sram_data
+    def write_sram_bytes(self, sram: Sram, byte_updates: dict):
+        """
+        write individual bytes with masked writes, the rest of each word is left untouched
+
+        sram: the sram object
+        byte_updates: {byte address: 8bit value}
+
+        return number of words written
+        """
+        writes = bytes_to_masked_writes(byte_updates)
+        # validate before any pin is touched
+        sram.check_writes(writes)
+        payload_strs = compile_masked_writes(writes)
+        logger.info(f"Writing {len(byte_updates)} bytes to SRAM: {sram.id_write}")
+        self._prepare_scan_in()
+        self._scan_payloads_to_sram(sram, payload_strs)
+        return len(writes)
+
+    def update_sram(self, sram: Sram, old_data: list, new_data: list):
+        """
+        turn sram content old_data into new_data by writing only the changed bytes,
+        e.g. consecutive image frames
+
+        sram: the sram object
+        old_data: data list currently in the sram
+        new_data: data list that should be in the sram
+
+        return number of words written
+        """
+        writes = diff_to_masked_writes(old_data, new_data)
+        # validate before any pin is touched
+        sram.check_writes(writes)
+        payload_strs = compile_masked_writes(writes)
+        logger.info(f"Updating {len(writes)} of {len(new_data)} words in SRAM: {sram.id_write}")
+        if writes:
+            self._prepare_scan_in()
+            self._scan_payloads_to_sram(sram, payload_strs)
+        return len(writes)
 
     def load_in_data_slow(self, config: Config):
         """
@@ -494,12 +544,14 @@ class Interface:
         logger.info(f"Program completed in {elapsed_time:.2f} seconds")
         return True
 
-    def _scan_from_sram(self, sram: Sram, data_len: int):
+    def _scan_from_sram(self, sram: Sram, data_len: int, verifier=None):
         """
         Read data from sram through scan chain
 
         sram: the sram object
         data_len: expected length of data, 0 to read all data, any other value will skip reading
+        verifier: optional object with expected, next_chunk_size() and check(start_addr, data_lst) -> bool,
+            called on every chunk of readout, reading stops when it returns False
         """
         logger.debug(f"Reading data from SRAM: {sram.id_read}")
 
@@ -523,29 +575,48 @@ class Interface:
             read_len = sram.row_count
             logger.debug("Reading all data from SRAM")
 
-        for addr in range(read_len):
-            # first load in target address
-            # set scan target
-            self._scan_ctrl(sram.id_write)
-            self.scanInValid.on()
-            payload_str = self._gen_scan_payload_str(
-                addr=addr, data=0, enable=True, write=False, mask="1111"
-            )
-            self._scan_write(payload_str)
-
-            # then read out data
-            self._scan_ctrl(sram.id_read)
-            readout_data = self._scan_read(scan_cycles=SRAM_WORD_WIDTH)
-            readout_data = int(readout_data, 2)
-            # store readout data = lst
-            read_out_lst.append(readout_data)
+        # leave test mode even if reading or verification fails part way
+        try:
+            if verifier is not None and read_len > len(verifier.expected):
+                raise ValueError(
+                    f"Readout is longer than verifier's expected data! Read length: {read_len}, expected length: {len(verifier.expected)}"
+                )
 
-        self.scanInValid.off()
-        self._tick_scan_clk()
+            chunk_start = 0
+            chunk_len = verifier.next_chunk_size() if verifier is not None else None
+            for addr in range(read_len):
+                # first load in target address
+                # set scan target
+                self._scan_ctrl(sram.id_write)
+                self.scanInValid.on()
+                payload_str = self._gen_scan_payload_str(
+                    addr=addr, data=0, enable=True, write=False, mask=FULL_MASK_STR
+                )
+                self._scan_write(payload_str)
+
+                # then read out data
+                self._scan_ctrl(sram.id_read)
+                readout_data = self._scan_read(scan_cycles=SRAM_WORD_WIDTH)
+                readout_data = int(readout_data, 2)
+                # store readout data = lst
+                read_out_lst.append(readout_data)
+
+                # verify chunk by chunk, stop early if the verifier asks to
+                if verifier is not None and (
+                    addr + 1 - chunk_start == chunk_len or addr + 1 == read_len
+                ):
+                    if not verifier.check(chunk_start, read_out_lst[chunk_start:]):
+                        logger.warning(f"Verification aborted reading SRAM {sram.id_read} at address {addr}")
+                        break
+                    chunk_start = addr + 1
+                    chunk_len = verifier.next_chunk_size()
+        finally:
+            self.scanInValid.off()
+            self._tick_scan_clk()
 
-        # unset test mode
-        self.testMode.off()
-        self._tick_scan_clk()
+            # unset test mode
+            self.testMode.off()
+            self._tick_scan_clk()
 
         return read_out_lst
 
@@ -554,6 +625,7 @@ class Interface:
         main_sram_data_len: int = None,
         input_sram_data_len: int = None,
         output_sram_data_len: int = None,
+        verifiers: dict = None,
     ):
         """
         read out data from srams
@@ -561,8 +633,10 @@ class Interface:
         main_sram_data_len: expected length of main sram data, 0 to read all data, None to skip reading
         input_sram_data_len: expected length of input sram data, 0 to read all data, None to skip reading
         output_sram_data_len: expected length of output sram data, 0 to read all data, None to skip reading
+        verifiers: optional {"main"/"input"/"output": verifier} checked while reading, see _scan_from_sram
         """
         logger.info("Loading out data")
+        verifiers = verifiers or {}
 
         # switch to external clock to manually tick the clock
         self.select_external_clk()
@@ -576,15 +650,21 @@ class Interface:
         output_read_data = None
 
         logger.info("Loading out main SRAM data")
-        main_read_data = self._scan_from_sram(self.main_sram, main_sram_data_len)
+        main_read_data = self._scan_from_sram(
+            self.main_sram, main_sram_data_len, verifiers.get("main")
+        )
         logger.debug(f"main read data: {main_read_data}")
 
         logger.info("Loading out input SRAM data")
-        input_read_data = self._scan_from_sram(self.input_sram, input_sram_data_len)
+        input_read_data = self._scan_from_sram(
+            self.input_sram, input_sram_data_len, verifiers.get("input")
+        )
         logger.debug(f"input read data: {input_read_data}")
 
         logger.info("Loading out output SRAM data")
-        output_read_data = self._scan_from_sram(self.output_sram, output_sram_data_len)
+        output_read_data = self._scan_from_sram(
+            self.output_sram, output_sram_data_len, verifiers.get("output")
+        )
         logger.debug(f"output read data: {output_read_data}")
 
         # set scan ctrl to write so riscv can run (weird issue that program done signal is not high when scan ctrl is set to read)
@@ -604,6 +684,7 @@ class Interface:
         main_sram_data_len: int = None,
         input_sram_data_len: int = None,
         output_sram_data_len: int = None,
+        verifiers: dict = None,
     ):
         """
         read out data from srams
@@ -611,6 +692,7 @@ class Interface:
         main_sram_data_len: expected length of main sram data, 0 to read all data, None to skip reading
         input_sram_data_len: expected length of input sram data, 0 to read all data, None to skip reading
         output_sram_data_len: expected length of output sram data, 0 to read all data, None to skip reading
+        verifiers: optional {"main"/"input"/"output": verifier} checked while reading, see _scan_from_sram
         """
 
         logger.info("switching to slow tick scan clock")
@@ -621,6 +703,7 @@ class Interface:
             main_sram_data_len=main_sram_data_len,
             input_sram_data_len=input_sram_data_len,
             output_sram_data_len=output_sram_data_len,
+            verifiers=verifiers,
         )
 
         logger.info("switching back to fast tick scan clock")
@@ -629,18 +712,6 @@ class Interface:
         return res
 
 
-def is_same_data(original_data, load_out_data):
-    """
-    Verify the data loaded out from the SRAM with the original data
-    """
-    if original_data == load_out_data:
-        logger.debug("Data match!")
-        return True
-    else:
-        logger.error("Data mismatch!")
-        return False
-
-
 if __name__ == "__main__":
     # Pre: both c_test_dump and data_dump should exists
     config = Config(c_test_dump="c_test_dump", data_hexdump="data_dump")  # TODO
@@ -0,0 +1,208 @@
+"""
+Chunked readout verification with mismatch diagnostics
+
+Usage:
+    verifier = Verifier(main_data, max_mismatches=16)
+    interface.load_out_data(len(main_data), verifiers={"main": verifier})
+    verifier.log_report()
+"""
+
+import numpy as np
+
+from host_utils import SRAM_WORD_WIDTH, logger
+
+DEFAULT_CHUNK_SIZE = 64
+MAX_SHIFT = 4  # largest bit shift checked when diagnosing shift errors
+
+
+class Verifier:
+    """
+    Compare readout against expected data chunk by chunk
+
+    expected: expected data list (or array) starting at address 0
+    max_mismatches: stop the readout once this many mismatching words are found, None to never stop
+    chunk_size: largest number of words per check() call from the readout loop, chunks shrink to the
+        remaining mismatch budget so the readout stops right at the last allowed mismatch
+    """
+
+    def __init__(
+        self,
+        expected,
+        max_mismatches=None,
+        chunk_size=DEFAULT_CHUNK_SIZE,
+        word_width=SRAM_WORD_WIDTH,
+    ):
+        self.expected = np.asarray(expected, dtype=np.uint64)
+        self.max_mismatches = max_mismatches
+        self.chunk_size = chunk_size
+        self.word_width = word_width
+        self._bits = np.arange(word_width, dtype=np.uint64)
+
+        self.checked = 0
+        self.aborted = False
+        self._addrs = []
+        self._expected = []
+        self._read = []
+        # per bit position: errors, 0->1 flips, 1->0 flips and expected ones over checked words
+        self.bit_errors = np.zeros(word_width, dtype=np.int64)
+        self.bit_rises = np.zeros(word_width, dtype=np.int64)
+        self.bit_falls = np.zeros(word_width, dtype=np.int64)
+        self.expected_ones = np.zeros(word_width, dtype=np.int64)
+
+    def _bit_counts(self, words):
+        return ((words[:, None] >> self._bits) & 1).sum(axis=0).astype(np.int64)
+
+    def next_chunk_size(self):
+        """
+        number of words the next check() call should cover
+        """
+        if self.max_mismatches is None:
+            return self.chunk_size
+        return max(1, min(self.chunk_size, self.max_mismatches - self.mismatch_count))
+
+    def check(self, start_addr, data_lst):
+        """
+        check one chunk of readout starting at start_addr
+
+        return False if the readout should stop
+        """
+        read = np.asarray(data_lst, dtype=np.uint64)
+        end_addr = start_addr + len(read)
+        if end_addr > len(self.expected):
+            raise ValueError(
+                f"Readout is longer than expected data! Readout end: {end_addr}, expected length: {len(self.expected)}"
+            )
+        expected = self.expected[start_addr:end_addr]
+        self.checked += len(read)
+        self.expected_ones += self._bit_counts(expected)
+
+        xor = read ^ expected
+        bad = np.flatnonzero(xor)
+        if bad.size:
+            self._addrs.append(bad + start_addr)
+            self._expected.append(expected[bad])
+            self._read.append(read[bad])
+            self.bit_errors += self._bit_counts(xor[bad])
+            self.bit_rises += self._bit_counts(xor[bad] & read[bad])
+            self.bit_falls += self._bit_counts(xor[bad] & expected[bad])
+
+        if self.max_mismatches is not None and self.mismatch_count >= self.max_mismatches:
+            self.aborted = True
+            return False
+        return True
+
+    def check_all(self, data_lst):
+        """
+        check a full readout starting at address 0 at once
+        """
+        start = 0
+        while start < len(data_lst):
+            end = start + self.next_chunk_size()
+            if not self.check(start, data_lst[start:end]):
+                break
+            start = end
+        return self.passed
+
+    @staticmethod
+    def _concat(arrays, dtype):
+        return np.concatenate(arrays) if arrays else np.zeros(0, dtype=dtype)
+
+    @property
+    def mismatch_count(self):
+        return sum(len(a) for a in self._addrs)
+
+    @property
+    def passed(self):
+        return self.mismatch_count == 0
+
+    @property
+    def mismatch_addrs(self):
+        return self._concat(self._addrs, np.int64)
+
+    @property
+    def mismatch_expected(self):
+        return self._concat(self._expected, np.uint64)
+
+    @property
+    def mismatch_read(self):
+        return self._concat(self._read, np.uint64)
+
+    @property
+    def xor_masks(self):
+        return self.mismatch_expected ^ self.mismatch_read
+
+    def diagnose(self):
+        """
+        guess the failure mode from the mismatches, return a list of human readable findings
+        """
+        findings = []
+        if self.passed:
+            return findings
+
+        expected_zeros = self.checked - self.expected_ones
+        for bit in np.flatnonzero(self.bit_errors):
+            if self.bit_falls[bit] == 0 and self.bit_rises[bit] == expected_zeros[bit]:
+                findings.append(f"bit {bit} stuck at 1")
+            elif self.bit_rises[bit] == 0 and self.bit_falls[bit] == self.expected_ones[bit]:
+                findings.append(f"bit {bit} stuck at 0")
+
+        word_mask = np.uint64((1 << self.word_width) - 1)
+        expected = self.mismatch_expected
+        read = self.mismatch_read
+        for shift in range(1, MAX_SHIFT + 1):
+            s = np.uint64(shift)
+            if np.all(read == ((expected << s) & word_mask)):
+                findings.append(f"data shifted left by {shift} bit(s)")
+            elif np.all(read == (expected >> s)):
+                findings.append(f"data shifted right by {shift} bit(s)")
+
+        # readout of the neighbouring address, e.g. address sent one scan cycle off
+        addrs = self.mismatch_addrs
+        for offset in (-1, 1):
+            src = addrs + offset
+            # the first/last word has no neighbour to compare with, ignore it
+            valid = (src >= 0) & (src < len(self.expected))
+            if np.any(valid) and np.all(read[valid] == self.expected[src[valid]]):
+                findings.append(f"readout comes from address offset {offset:+d}")
+
+        return findings
+
+    def report(self, max_lines=16):
+        """
+        human readable summary of the mismatches
+        """
+        if self.passed:
+            return f"Data match! ({self.checked} words checked)"
+
+        lines = [
+            f"Data mismatch! {self.mismatch_count} of {self.checked} words checked"
+            + (" (aborted early)" if self.aborted else "")
+        ]
+        hex_width = self.word_width // 4
+        for addr, exp, read in list(
+            zip(self.mismatch_addrs, self.mismatch_expected, self.mismatch_read)
+        )[:max_lines]:
+            lines.append(
+                f"  addr {int(addr):#06x}: expected {int(exp):0{hex_width}x}, read {int(read):0{hex_width}x}, xor {int(exp ^ read):0{hex_width}x}"
+            )
+        if self.mismatch_count > max_lines:
+            lines.append(f"  ... {self.mismatch_count - max_lines} more")
+
+        error_bits = np.flatnonzero(self.bit_errors)
+        lines.append(
+            "  errors per bit: "
+            + ", ".join(
+                f"{bit}:{self.bit_errors[bit]} (+{self.bit_rises[bit]}/-{self.bit_falls[bit]})"
+                for bit in error_bits
+            )
+        )
+        for finding in self.diagnose():
+            lines.append(f"  diagnosis: {finding}")
+        return "\n".join(lines)
+
+    def log_report(self):
+        if self.passed:
+            logger.debug(self.report())
+        else:
+            logger.error(self.report())
+        return self.passed